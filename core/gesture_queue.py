@@ -0,0 +1,111 @@
+# core/gesture_queue.py
+"""
+Per-session ingestion queue between the detector thread and the event loop.
+
+The detector thread hands events over with `put_threadsafe`; everything else
+runs on the loop thread, so the queue itself needs no locks. One consumer
+task drains it in batches (see LearnerSession in main.py).
+"""
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional
+
+if TYPE_CHECKING:  # keep core free of the cv2/mediapipe import chain
+    from cv.gesture_detector import GestureEvent
+
+SWIPES = ("SWIPE_LEFT", "SWIPE_UP")
+
+
+class GestureQueue:
+    def __init__(
+        self,
+        maxsize: int = 32,
+        coalesce_window: float = 0.3,
+        is_busy: Optional[Callable[[], bool]] = None,
+    ):
+        self.maxsize = maxsize
+        self.coalesce_window = coalesce_window
+        self.is_busy = is_busy or (lambda: False)
+
+        self._events: Deque["GestureEvent"] = deque()
+        self._ready = asyncio.Event()
+        self._last_swipe: Optional["GestureEvent"] = None
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped_busy = 0
+        self.dropped_full = 0
+        self.forced_cancels = 0
+        self.batches = 0
+        self.max_depth = 0
+
+    def put_threadsafe(self, event: "GestureEvent", loop: asyncio.AbstractEventLoop):
+        loop.call_soon_threadsafe(self.put_nowait, event)
+
+    def put_nowait(self, event: "GestureEvent") -> bool:
+        """Queue an event (loop thread only). Returns False if it was dropped or merged."""
+        # A raise that started and was cancelled before we got to it is a no-op
+        if event.type == "HAND_RAISE_CANCEL":
+            if self._events and self._events[-1].type == "HAND_RAISE_START":
+                self._events.pop()
+                self.coalesced += 2
+                return False
+
+            # Never drop a cancel: its START may already have opened the mic
+            if self.is_busy() or len(self._events) >= self.maxsize:
+                self.forced_cancels += 1
+            return self._append(event)
+
+        # Nothing the learner does mid-transcription should act on the deck
+        if self.is_busy():
+            self.dropped_busy += 1
+            return False
+
+        # Jittery detector output: the same swipe again within the window
+        if event.type in SWIPES:
+            last = self._last_swipe
+            if (
+                last is not None
+                and last.type == event.type
+                and event.timestamp - last.timestamp <= self.coalesce_window
+            ):
+                self.coalesced += 1
+                return False
+
+        if len(self._events) >= self.maxsize:
+            self.dropped_full += 1
+            return False
+
+        if event.type in SWIPES:
+            self._last_swipe = event
+        return self._append(event)
+
+    def _append(self, event: "GestureEvent") -> bool:
+        self._events.append(event)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, len(self._events))
+        self._ready.set()
+        return True
+
+    async def get_batch(self) -> List["GestureEvent"]:
+        """Wait for at least one event, then take everything queued."""
+        while not self._events:
+            self._ready.clear()
+            await self._ready.wait()
+
+        batch = list(self._events)
+        self._events.clear()
+        self.batches += 1
+        return batch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._events),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "dropped_busy": self.dropped_busy,
+            "dropped_full": self.dropped_full,
+            "forced_cancels": self.forced_cancels,
+            "batches": self.batches,
+        }
@@ -0,0 +1,239 @@
+# core/journal.py
+"""
+Append-only binary journal of session events.
+
+Each record is a fixed header followed by a compact JSON payload:
+
+    <u32 payload length> <u32 crc32> <u8 kind> <f64 timestamp> <16 bytes session id> <payload>
+
+Appends are cheap (encode + list append); a background thread writes and
+fsyncs whatever has accumulated in one go, so the event loop never blocks
+on disk. Replay memory-maps the file and stops at the first torn or
+corrupt record, which is what a crash mid-write leaves behind; reopening
+for writing truncates that tail so new records stay replayable. A corrupt
+record with more data after it is not a torn write, so the writer refuses
+to open the file rather than truncate away the records that follow.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+MAGIC = b"GLJ1"
+
+GESTURE = 1
+STT = 2
+DECK = 3
+
+_HEADER = struct.Struct("<IIBd16s")
+
+
+@dataclass
+class JournalRecord:
+    kind: int
+    timestamp: float
+    session_id: str
+    payload: Optional[Dict[str, Any]]
+
+
+def encode_record(kind: int, session_id: str, payload: Dict[str, Any], timestamp: float) -> bytes:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(body), zlib.crc32(body), kind, timestamp, bytes.fromhex(session_id)) + body
+
+
+class JournalWriter:
+    def __init__(self, path: str, flush_interval: float = 0.05, max_pending: int = 100_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: List[bytes] = []
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.records_written = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.dropped = 0
+        self.error: Optional[str] = None
+
+        end = valid_length(path)
+        self._file = open(path, "ab")
+        if self._file.tell() != end:
+            print(f"[journal] Truncating torn tail of {path} at byte {end}")
+            self._file.truncate(end)
+            self._file.seek(end)
+        if end == 0:
+            self._file.write(MAGIC)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, kind: int, session_id: str, payload: Dict[str, Any], timestamp: Optional[float] = None):
+        record = encode_record(kind, session_id, payload, timestamp or time.time())
+        with self._cond:
+            if self._closed or self.error is not None or len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(record)
+            if len(self._pending) == 1:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+                closed = self._closed
+
+            if batch:
+                data = b"".join(batch)
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    # e.g. disk full: stop journaling rather than queueing forever
+                    print(f"[journal] ERROR writing {self.path}: {e}. Journaling disabled.")
+                    with self._cond:
+                        self.error = str(e)
+                        self.dropped += len(batch) + len(self._pending)
+                        self._pending = []
+                    return
+
+                self.records_written += len(batch)
+                self.bytes_written += len(data)
+                self.fsyncs += 1
+
+            if closed:
+                return
+
+            # Let appends pile up so the next fsync covers a whole group
+            time.sleep(self.flush_interval)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        try:
+            self._file.close()
+        except OSError as e:
+            print(f"[journal] ERROR closing {self.path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "records_written": self.records_written,
+            "bytes_written": self.bytes_written,
+            "fsyncs": self.fsyncs,
+            "pending": pending,
+            "dropped": self.dropped,
+            "error": self.error,
+        }
+
+
+def _walk(mm) -> Iterator[tuple]:
+    """Yield (kind, timestamp, session bytes, body start, body end) for each intact record."""
+    offset = len(MAGIC)
+    end = len(mm)
+    header_size = _HEADER.size
+
+    while offset + header_size <= end:
+        length, crc, kind, timestamp, sid = _HEADER.unpack_from(mm, offset)
+        start = offset + header_size
+        stop = start + length
+        if stop > end:
+            return  # torn tail
+        if zlib.crc32(mm[start:stop]) != crc:
+            return
+
+        yield kind, timestamp, sid, start, stop
+        offset = stop
+
+
+def valid_length(path: str) -> int:
+    """
+    Byte offset just past the last intact record (0 if there is no usable
+    journal). Raises ValueError if anything but a torn tail follows it.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) < len(MAGIC):
+        return 0
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a session journal")
+        if os.path.getsize(path) == len(MAGIC):
+            return len(MAGIC)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(MAGIC)
+            for *_, stop in _walk(mm):
+                end = stop
+
+            # The record that stopped the walk must run to EOF to be a torn write
+            if end + _HEADER.size <= len(mm):
+                length = _HEADER.unpack_from(mm, end)[0]
+                if end + _HEADER.size + length < len(mm):
+                    raise ValueError(f"{path} has a corrupt record at byte {end} followed by more data")
+            return end
+
+
+def iter_records(
+    path: str,
+    session_id: Optional[str] = None,
+    kinds: Optional[Sequence[int]] = None,
+    decode: bool = True,
+) -> Iterator[JournalRecord]:
+    """
+    Scan a journal via mmap. Filtering on session and kind happens on the
+    header alone, so analytics that skip `decode` never touch the JSON.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= len(MAGIC):
+        return
+
+    wanted_session = bytes.fromhex(session_id) if session_id else None
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a session journal")
+
+        for kind, timestamp, sid, start, stop in _walk(mm):
+            if wanted_session is not None and sid != wanted_session:
+                continue
+            if kinds is not None and kind not in kinds:
+                continue
+
+            yield JournalRecord(
+                kind=kind,
+                timestamp=timestamp,
+                session_id=sid.hex(),
+                payload=json.loads(mm[start:stop]) if decode else None,
+            )
+
+
+def list_sessions(path: str) -> List[str]:
+    """Session ids in the order they first appear."""
+    seen: Dict[str, None] = {}
+    for record in iter_records(path, decode=False):
+        seen.setdefault(record.session_id, None)
+    return list(seen)
+
+
+def replay_deck_state(path: str, session_id: str) -> Dict[str, Any]:
+    """Rebuild a session's deck position and buckets from its DECK records."""
+    state: Dict[str, Any] = {"index": 0, "learned": [], "study_more": [], "revisit": []}
+
+    for record in iter_records(path, session_id=session_id, kinds=(DECK,)):
+        payload = record.payload
+        state[payload["action"]].append(payload["word"])
+        state["index"] = payload["index"]
+
+    return state
@@ -1,3 +1,10 @@
 # core/listening_state.py
 
 is_listening = False
+
+
+class ListeningState:
+    """Per-session listening flag; this module itself is the default session's."""
+
+    def __init__(self):
+        self.is_listening = False
@@ -34,6 +34,9 @@ class GestureDetector:
         self.last_hand_up_time = 0.0
         self.hand_up_cooldown = 2.0
 
+        # True between HAND_RAISE_START and its HAND_UP / HAND_RAISE_CANCEL
+        self.raise_pending = False
+
         self.mp_hands = mp.solutions.hands.Hands(
             static_image_mode=False,
             max_num_hands=1,
@@ -45,6 +48,36 @@ class GestureDetector:
         self.debug("EMIT:", gesture_type)
         self.callback(GestureEvent(type=gesture_type, timestamp=time.time()))
 
+    def cancel_raise(self):
+        self.hand_raised_since = None
+        if self.raise_pending:
+            self.raise_pending = False
+            self.emit("HAND_RAISE_CANCEL")
+
+    def update_raise(self, is_raised: bool, now: float):
+        """Advance the hand-raise dwell timer for one frame."""
+        if not is_raised:
+            self.cancel_raise()
+            return
+
+        if self.hand_raised_since is None:
+            self.hand_raised_since = now
+            self.debug("Hand raise start")
+
+            # Speculative: let the backend open the mic before HAND_UP
+            if now - self.last_hand_up_time > self.hand_up_cooldown:
+                self.raise_pending = True
+                self.emit("HAND_RAISE_START")
+
+        elif now - self.hand_raised_since >= self.min_raise_duration:
+            if now - self.last_hand_up_time > self.hand_up_cooldown:
+                self.last_hand_up_time = now
+                self.raise_pending = False
+                self.emit("HAND_UP")
+                self.hand_raised_since = None
+            else:
+                self.cancel_raise()
+
     def run(self):
         cap = cv2.VideoCapture(self.camera_index)
         if not cap.isOpened():
@@ -77,7 +110,7 @@ class GestureDetector:
                 self.debug("Hand center:", center)
             else:
                 self.prev_center = None
-                self.hand_raised_since = None
+                self.cancel_raise()
                 continue
 
             # Swipe detection
@@ -90,21 +123,7 @@ class GestureDetector:
 
             # Hand-up detection
             RAISE_THRESHOLD = 0.22
-            is_raised = center.y < RAISE_THRESHOLD
-
-            if is_raised:
-                if self.hand_raised_since is None:
-                    self.hand_raised_since = time.time()
-                    self.debug("Hand raise start")
-
-                elif time.time() - self.hand_raised_since >= self.min_raise_duration:
-                    now = time.time()
-                    if now - self.last_hand_up_time > self.hand_up_cooldown:
-                        self.last_hand_up_time = now
-                        self.emit("HAND_UP")
-                    self.hand_raised_since = None
-            else:
-                self.hand_raised_since = None
+            self.update_raise(center.y < RAISE_THRESHOLD, time.time())
 
             self.prev_center = center
 
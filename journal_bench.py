@@ -0,0 +1,64 @@
+"""Benchmark session journal append and replay throughput.
+
+Run via: python journal_bench.py [--events 1000000]
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from core import journal
+from word_bank import WORD_BANK
+
+
+def run(events: int, sessions: int):
+    words = list(WORD_BANK)
+    session_ids = [uuid.uuid4().hex for _ in range(sessions)]
+    path = os.path.join(tempfile.mkdtemp(), "bench.journal")
+
+    writer = journal.JournalWriter(path)
+    start = time.perf_counter()
+    for i in range(events):
+        session_id = session_ids[i % sessions]
+        if i % 3 == 0:
+            writer.append(journal.GESTURE, session_id, {"type": "SWIPE_UP"})
+        else:
+            writer.append(
+                journal.DECK,
+                session_id,
+                {"action": "study_more", "word": words[i % len(words)], "index": (i + 1) % len(words)},
+            )
+    append_s = time.perf_counter() - start
+    writer.close()
+    write_s = time.perf_counter() - start
+    stats = writer.stats()
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in journal.iter_records(path, decode=False))
+    scan_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = sum(1 for _ in journal.iter_records(path))
+    decode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state = journal.replay_deck_state(path, session_ids[0])
+    replay_s = time.perf_counter() - start
+
+    print(f"[bench] {events} events, {stats['bytes_written'] / 1e6:.1f} MB, {stats['fsyncs']} fsyncs")
+    print(f"[bench] append:        {events / append_s:,.0f} events/s")
+    print(f"[bench] append+fsync:  {events / write_s:,.0f} events/s")
+    print(f"[bench] header scan:   {scanned / scan_s:,.0f} records/s ({scan_s:.2f}s)")
+    print(f"[bench] decoded scan:  {decoded / decode_s:,.0f} records/s ({decode_s:.2f}s)")
+    print(f"[bench] deck replay:   {replay_s:.2f}s (index={state['index']}, study_more={len(state['study_more'])})")
+
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--sessions", type=int, default=10)
+    args = parser.parse_args()
+    run(args.events, args.sessions)
@@ -0,0 +1,424 @@
+"""In-process load test: many simulated learners against one backend.
+
+Each simulated learner gets its own LearnerSession (deck, subscribers,
+listening flag) driven by synthetic GestureEvents and a fake STT backend
+with a configurable latency distribution.
+
+The app's default session is served by uvicorn on this same event loop
+and watched by real WebSocket clients on /ws, so its numbers include JSON
+serialization and the socket send path. The other sessions have no route
+of their own (the app serves one learner), so their subscribers are fakes
+attached straight to their ConnectionManager and skip that path.
+
+Run via: python load_test.py --sessions 2000 --out load_results.json
+Compare: python load_test.py --baseline load_results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import statistics
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import uvicorn
+import websockets
+
+import main
+from core.listening_state import ListeningState
+from cv.gesture_detector import GestureEvent
+from word_bank import WORD_BANK
+
+
+# -----------------------------------------------------
+# Fakes
+# -----------------------------------------------------
+def parse_latency(spec: str):
+    """
+    Latency distribution in seconds:
+    fixed:0.4 | uniform:0.2,0.8 | lognormal:-1.0,0.5
+    """
+    kind, _, args = spec.partition(":")
+    params = [float(a) for a in args.split(",") if a]
+
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: random.uniform(params[0], params[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(params[0], params[1])
+
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class FakeSpeechToText:
+    """Stands in for SpeechToText: sleeps like Whisper, answers like a learner."""
+
+    def __init__(self, latency, accuracy: float = 0.7):
+        self.latency = latency
+        self.accuracy = accuracy
+
+    def begin_preroll(self):
+        pass
+
+    def cancel_preroll(self):
+        pass
+
+    def transcribe(self, card_id: Optional[str] = None) -> str:
+        time.sleep(self.latency())
+        if card_id and random.random() < self.accuracy:
+            return WORD_BANK[card_id]
+        return "no se"
+
+
+class FakeSubscriber:
+    """Duck-typed WebSocket that records when state broadcasts arrive."""
+
+    route = "fake"
+
+    def __init__(self):
+        self.messages = 0
+        self.last_state_at = 0.0
+        self.state_received = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, msg: dict):
+        self.messages += 1
+        if msg.get("type") == "state":
+            self.last_state_at = time.perf_counter()
+            self.state_received.set()
+
+
+class WebSocketSubscriber:
+    """A real client on the app's /ws route."""
+
+    route = "ws"
+
+    def __init__(self, url: str):
+        self.url = url
+        self.messages = 0
+        self.last_state_at = 0.0
+        self.state_received = asyncio.Event()
+        self._conn = None
+        self._reader = None
+
+    async def connect(self):
+        self._conn = await websockets.connect(self.url, max_queue=None)
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for raw in self._conn:
+                self.messages += 1
+                if json.loads(raw).get("type") == "state":
+                    self.last_state_at = time.perf_counter()
+                    self.state_received.set()
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self):
+        await self._conn.close()
+        await self._reader
+
+
+async def serve_app():
+    """Run the FastAPI app under uvicorn on this loop; returns (server, task, port)."""
+    config = uvicorn.Config(
+        main.app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, port
+
+
+def current_rss_kb() -> float:
+    """Resident set size now (Linux), falling back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def pause(mean: float) -> float:
+    return random.expovariate(1 / mean) if mean > 0 else 0.0
+
+
+# -----------------------------------------------------
+# Learner simulation
+# -----------------------------------------------------
+def build_session(stt, subscribers: int):
+    deck = main.DeckManager(WORD_BANK)
+    ws = main.ConnectionManager()
+    session = main.LearnerSession(
+        uuid.uuid4().hex, deck, ws, stt, listening=ListeningState()
+    )
+    subs = [FakeSubscriber() for _ in range(subscribers)]
+    return session, subs
+
+
+def inject(session, event_type: str) -> bool:
+    """Deliver an event to the session's ingestion queue, as the detector callback does."""
+    return session.queue.put_nowait(GestureEvent(type=event_type, timestamp=time.time()))
+
+
+async def run_learner(session, subs, args, events: int, latencies: Dict[str, Dict[str, List[float]]], counts: Dict[str, int]):
+    watcher = subs[-1]
+    route_latencies = latencies[watcher.route]
+    await asyncio.sleep(random.uniform(0, args.think))
+
+    for _ in range(events):
+        roll = random.random()
+        if roll < args.answer_rate:
+            gesture = "HAND_UP"
+            inject(session, "HAND_RAISE_START")
+            counts["injected"] += 1
+            await asyncio.sleep(0.25)
+        elif roll < args.answer_rate + args.cancel_rate:
+            inject(session, "HAND_RAISE_START")
+            await asyncio.sleep(0.1)
+            inject(session, "HAND_RAISE_CANCEL")
+            counts["injected"] += 2
+            await asyncio.sleep(pause(args.think))
+            continue
+        else:
+            gesture = random.choice(("SWIPE_LEFT", "SWIPE_UP"))
+
+        watcher.state_received.clear()
+        sent = time.perf_counter()
+        accepted = inject(session, gesture)
+        counts["injected"] += 1
+
+        # Detector jitter: the same swipe repeated a few times within ~50 ms
+        if gesture != "HAND_UP" and random.random() < args.jitter_rate:
+            for _ in range(random.randint(1, 3)):
+                await asyncio.sleep(random.uniform(0.005, 0.02))
+                inject(session, gesture)
+                counts["injected"] += 1
+
+        if accepted:
+            try:
+                await asyncio.wait_for(watcher.state_received.wait(), timeout=args.timeout)
+                route_latencies[gesture].append(watcher.last_state_at - sent)
+            except asyncio.TimeoutError:
+                counts["timeouts"] += 1
+
+        await asyncio.sleep(pause(args.think))
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def latency_report(latencies: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    swipes = latencies["SWIPE_LEFT"] + latencies["SWIPE_UP"]
+    return {
+        "gesture_to_broadcast": percentiles(swipes + latencies["HAND_UP"]),
+        "swipe_to_broadcast": percentiles(swipes),
+        "hand_up_to_broadcast": percentiles(latencies["HAND_UP"]),
+    }
+
+
+async def run(args) -> dict:
+    if args.executor_workers:
+        # STT calls and pre-roll open/close share the loop's default executor
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=args.executor_workers)
+        )
+
+    stt = FakeSpeechToText(parse_latency(args.stt_latency), accuracy=args.accuracy)
+
+    # The app's own session, watched through /ws
+    server, server_task, port = await serve_app()
+    main.session.stt_engine = stt
+    main.session.start()
+    ws_subs = [WebSocketSubscriber(f"ws://127.0.0.1:{port}/ws") for _ in range(args.ws_clients)]
+    for sub in ws_subs:
+        await sub.connect()
+    while len(main.ws_manager.active) < len(ws_subs):
+        await asyncio.sleep(0.01)
+
+    # Server and /ws clients are fixed cost, not per-session memory
+    rss_before = current_rss_kb()
+    sessions = []
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(args.sessions):
+        session, subs = build_session(stt, args.subscribers)
+        for sub in subs:
+            await session.ws_manager.connect(sub)
+        session.start()
+        sessions.append((session, subs))
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = {
+        route: {"SWIPE_LEFT": [], "SWIPE_UP": [], "HAND_UP": []} for route in ("ws", "fake")
+    }
+    counts = {"injected": 0, "timeouts": 0}
+    ws_counts = {"injected": 0, "timeouts": 0}
+    lag: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag, stop))
+
+    # The /ws learner runs alongside; throughput is timed over the simulated sessions
+    ws_learner = None
+    if ws_subs:
+        ws_learner = asyncio.create_task(
+            run_learner(main.session, ws_subs, args, args.ws_events, latencies, ws_counts)
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_learner(session, subs, args, args.events, latencies, counts)
+        for session, subs in sessions
+    ))
+    elapsed = time.perf_counter() - start
+    accepted = sum(session.queue.enqueued for session, _ in sessions)
+
+    if ws_learner is not None:
+        await ws_learner
+        sessions.append((main.session, ws_subs))
+
+    stop.set()
+    await monitor
+
+    # Sessions, queues and subscribers are all still alive here
+    rss_after = current_rss_kb()
+
+    for sub in ws_subs:
+        await sub.close()
+    server.should_exit = True
+    await server_task
+
+    queue_stats = [session.queue.stats() for session, _ in sessions]
+    combined = {
+        gesture: latencies["ws"][gesture] + latencies["fake"][gesture]
+        for gesture in latencies["ws"]
+    }
+    return {
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 3),
+        "events_injected": counts["injected"],
+        "events_accepted": accepted,
+        "accepted_events_per_s": round(accepted / elapsed, 1),
+        "broadcasts_received": sum(sub.messages for _, subs in sessions for sub in subs),
+        "timeouts": counts["timeouts"] + ws_counts["timeouts"],
+        "gesture_queue": {
+            "max_depth": max(q["max_depth"] for q in queue_stats),
+            "coalesced": sum(q["coalesced"] for q in queue_stats),
+            "dropped_busy": sum(q["dropped_busy"] for q in queue_stats),
+            "dropped_full": sum(q["dropped_full"] for q in queue_stats),
+            "forced_cancels": sum(q["forced_cancels"] for q in queue_stats),
+            "state_broadcasts": sum(session.state_broadcasts for session, _ in sessions),
+        },
+        **latency_report(combined),
+        "ws_route": {
+            "clients": len(ws_subs),
+            "events_injected": ws_counts["injected"],
+            **latency_report(latencies["ws"]),
+        },
+        "event_loop_lag": percentiles(lag),
+        "memory_per_session_kb": {
+            "at_construction": round((after - before) / args.sessions / 1024, 2),
+            "after_run": round((rss_after - rss_before) / len(sessions), 2),
+        },
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    rows = [
+        ("accepted events/s", results["accepted_events_per_s"], baseline.get("accepted_events_per_s")),
+        ("p50 gesture→broadcast ms", results["gesture_to_broadcast"].get("p50_ms"), baseline.get("gesture_to_broadcast", {}).get("p50_ms")),
+        ("p99 gesture→broadcast ms", results["gesture_to_broadcast"].get("p99_ms"), baseline.get("gesture_to_broadcast", {}).get("p99_ms")),
+        ("p99 loop lag ms", results["event_loop_lag"].get("p99_ms"), baseline.get("event_loop_lag", {}).get("p99_ms")),
+        ("p99 /ws gesture→broadcast ms", results["ws_route"]["gesture_to_broadcast"].get("p99_ms"), baseline.get("ws_route", {}).get("gesture_to_broadcast", {}).get("p99_ms")),
+        ("memory/session KB after run", results["memory_per_session_kb"]["after_run"], baseline.get("memory_per_session_kb", {}).get("after_run")),
+    ]
+    for name, now, then in rows:
+        change = f"{(now - then) / then * 100:+.1f}%" if now is not None and then else "n/a"
+        print(f"[load] {name:<30} {then!s:>10} → {now!s:>10}  ({change})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--subscribers", type=int, default=2, help="fake subscribers per simulated session")
+    parser.add_argument("--ws-clients", type=int, default=50,
+                        help="real /ws clients on the app's default session (0 to skip)")
+    parser.add_argument("--ws-events", type=int, default=100,
+                        help="gestures on the default session (not counted in accepted events/s)")
+    parser.add_argument("--events", type=int, default=20, help="gestures per session")
+    parser.add_argument("--think", type=float, default=0.5,
+                        help="mean seconds between gestures; lower it (down to 0) to probe capacity")
+    parser.add_argument("--answer-rate", type=float, default=0.3)
+    parser.add_argument("--cancel-rate", type=float, default=0.1)
+    parser.add_argument("--accuracy", type=float, default=0.7)
+    parser.add_argument("--jitter-rate", type=float, default=0.2,
+                        help="chance a swipe is followed by a burst of duplicates")
+    parser.add_argument("--stt-latency", default="lognormal:-1.0,0.5")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--executor-workers", type=int, default=256,
+                        help="default executor size; 0 keeps asyncio's default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="load_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep per-event backend logging")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    with open(os.devnull, "w") as devnull:
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with quiet:
+            results = asyncio.run(run(args))
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"[load] {results['events_accepted']} of {results['events_injected']} events accepted in "
+          f"{results['elapsed_s']}s ({results['accepted_events_per_s']} events/s), {results['timeouts']} timeouts")
+    print(f"[load] gesture→broadcast {results['gesture_to_broadcast']}")
+    print(f"[load] via /ws           {results['ws_route']['gesture_to_broadcast']}")
+    print(f"[load] event-loop lag    {results['event_loop_lag']}")
+    print(f"[load] gesture queue     {results['gesture_queue']}")
+    print(f"[load] memory/session    {results['memory_per_session_kb']} KB, max RSS {results['max_rss_mb']} MB")
+    print(f"[load] Results saved to {args.out}")
+
+    if args.baseline:
+        compare(results, args.baseline)
@@ -4,9 +4,12 @@ os.environ["OPENCV_AVFOUNDATION_SKIP_AUTH"] = "1"
 from dotenv import load_dotenv
 import asyncio
 import threading
+import time
 import re
 import unicodedata
-from typing import Dict, Any
+import uuid
+from collections import deque
+from typing import Callable, Dict, Any, Optional
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,11 +18,14 @@ import uvicorn
 from word_bank import WORD_BANK
 from cv.gesture_detector import GestureDetector, GestureEvent
 from stt.speech_to_text import SpeechToText
+from stt.cache import TranscriptionCache
 from ui.flashcard_view import FlashcardView
 from ui.animations import Animations
 
 # 🔥 Shared listening state
 import core.listening_state as listening_state
+from core import journal as session_journal
+from core.gesture_queue import GestureQueue
 
 load_dotenv()
 
@@ -45,10 +51,15 @@ def normalize_answer(text: str) -> str:
 # Deck Manager
 # -----------------------------------------------------
 class DeckManager:
-    def __init__(self, word_bank: Dict[str, str]):
+    def __init__(
+        self,
+        word_bank: Dict[str, str],
+        on_transition: Optional[Callable[[str, str, int], None]] = None,
+    ):
         self.all_words = list(word_bank.items())
         self.index = 0
         self.word_bank = word_bank
+        self.on_transition = on_transition
 
         self.learned_words = []
         self.study_more_words = []
@@ -57,22 +68,34 @@ class DeckManager:
         self.current_word = self.all_words[self.index][0]
         self.view = FlashcardView()
 
-    def _advance(self):
+    def _advance(self, action: str):
+        word = self.current_word
         self.index = (self.index + 1) % len(self.all_words)
         self.current_word = self.all_words[self.index][0]
         print(f"[deck] Advanced → {self.current_word}")
 
+        if self.on_transition:
+            self.on_transition(action, word, self.index)
+
     def mark_study_more(self):
         self.study_more_words.append(self.current_word)
-        self._advance()
+        self._advance("study_more")
 
     def mark_revisit(self):
         self.revisit_words.append(self.current_word)
-        self._advance()
+        self._advance("revisit")
 
     def mark_learned(self):
         self.learned_words.append(self.current_word)
-        self._advance()
+        self._advance("learned")
+
+    def restore(self, state: Dict[str, Any]):
+        """Load deck position and buckets rebuilt from the session journal."""
+        self.index = state["index"] % len(self.all_words)
+        self.current_word = self.all_words[self.index][0]
+        self.learned_words = list(state["learned"])
+        self.study_more_words = list(state["study_more"])
+        self.revisit_words = list(state["revisit"])
 
     def evaluate_spoken(self, spoken: str) -> bool:
         expected = normalize_answer(self.word_bank[self.current_word])
@@ -119,10 +142,10 @@ class ConnectionManager:
             except:
                 self.disconnect(ws)
 
-    async def broadcast_state(self):
+    async def broadcast_state(self, deck: DeckManager):
         await self.broadcast({
             "type": "state",
-            "payload": deck_manager.get_state()
+            "payload": deck.get_state()
         })
 
 
@@ -139,10 +162,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-deck_manager = DeckManager(WORD_BANK)
-stt_engine = SpeechToText(mode="whisper", duration=3.0)
+JOURNAL_PATH = os.getenv("GESTURE_JOURNAL", "sessions.journal")
+journal = None
+
+stt_cache = TranscriptionCache(max_entries=512, ttl=600.0)
 animations = Animations()
-ws_manager = ConnectionManager()
 
 ASYNC_LOOP = None
 gesture_detector = None
@@ -151,69 +175,205 @@ gesture_thread_lock = threading.Lock()
 
 
 # -----------------------------------------------------
-# Gesture Handler
+# Learner Session
 # -----------------------------------------------------
-async def handle_gesture_event(event: GestureEvent):
-    print(f"[gesture-handler] Received: {event.type}")
-
-    if listening_state.is_listening:
-        return
-
-    if event.type == "SWIPE_LEFT":
-        deck_manager.mark_revisit()
-        await ws_manager.broadcast({
-            "type": "event",
-            "payload": {"kind": "gesture", "name": "SWIPE_LEFT"}
-        })
-
-    elif event.type == "SWIPE_UP":
-        deck_manager.mark_study_more()
-        await ws_manager.broadcast({
-            "type": "event",
-            "payload": {"kind": "gesture", "name": "SWIPE_UP"}
-        })
-
-    elif event.type == "HAND_UP":
-        listening_state.is_listening = True
-
-        # ✅ THIS IS THE CRITICAL FIX
-        await ws_manager.broadcast({
-            "type": "event",
-            "payload": {"kind": "gesture", "name": "HAND_UP"}
-        })
+class LearnerSession:
+    """
+    Everything one learner's gestures act on: deck, subscribers, STT engine
+    and listening flag. The app serves a single default session; the load
+    harness builds thousands of them in one process.
+
+    Gestures go through a bounded GestureQueue drained by one consumer task,
+    so handlers never overlap on the deck and each drain cycle sends a
+    single state update.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        deck_manager: DeckManager,
+        ws_manager: ConnectionManager,
+        stt_engine,
+        listening=listening_state,
+    ):
+        self.session_id = session_id
+        self.deck_manager = deck_manager
+        self.ws_manager = ws_manager
+        self.stt_engine = stt_engine
+        self.listening = listening
+        self.raise_started_at = None
+
+        # Raise-start → verdict, split by whether pre-roll was on
+        self.verdict_latencies = {"preroll": deque(maxlen=200), "no_preroll": deque(maxlen=200)}
+
+        self.queue = GestureQueue(is_busy=lambda: self.listening.is_listening)
+        self.state_broadcasts = 0
+        self._consumer = None
+
+        deck_manager.on_transition = self.record_transition
+
+    def start(self):
+        if self._consumer is None:
+            self._consumer = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while True:
+            batch = await self.queue.get_batch()
+
+            changed = False
+            answered = False
+            for event in batch:
+                # Queued behind an answer: the same as arriving while busy
+                if answered and event.type != "HAND_RAISE_CANCEL":
+                    self.queue.dropped_busy += 1
+                    continue
+
+                try:
+                    changed |= await self.apply_gesture_event(event)
+                except Exception as e:
+                    print(f"[gesture-handler] ERROR handling {event.type}: {e}")
+                answered = answered or event.type == "HAND_UP"
+
+            if changed:
+                self.state_broadcasts += 1
+                await self.ws_manager.broadcast_state(self.deck_manager)
+
+    def record(self, kind: int, payload: Dict[str, Any], timestamp: Optional[float] = None):
+        if journal is not None:
+            journal.append(kind, self.session_id, payload, timestamp)
+
+    def record_transition(self, action: str, word: str, index: int):
+        self.record(session_journal.DECK, {"action": action, "word": word, "index": index})
+
+    def latency_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for mode, samples in self.verdict_latencies.items():
+            ordered = sorted(latency for latency, _ in samples)
+            correct = sum(1 for _, ok in samples if ok)
+            stats[mode] = {
+                "count": len(ordered),
+                "p50_ms": ordered[len(ordered) // 2] if ordered else None,
+                "p90_ms": ordered[int(len(ordered) * 0.9)] if ordered else None,
+                "correct": correct,
+                "accuracy": round(correct / len(ordered), 3) if ordered else None,
+            }
+        return stats
+
+    async def apply_gesture_event(self, event: GestureEvent) -> bool:
+        """Handle one gesture; returns whether deck state changed."""
+        deck_manager = self.deck_manager
+        ws_manager = self.ws_manager
+
+        print(f"[gesture-handler] Received: {event.type}")
+        self.record(session_journal.GESTURE, {"type": event.type}, event.timestamp)
+
+        # Always honoured, so a START that opened the mic is never left dangling
+        if event.type == "HAND_RAISE_CANCEL":
+            self.raise_started_at = None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.stt_engine.cancel_preroll)
+            return False
+
+        if self.listening.is_listening:
+            return False
+
+        # Speculative path: open the mic pre-roll while HAND_UP is still pending.
+        # The raise start is also the latency origin when pre-roll is off, so
+        # both modes are timed over the same span.
+        if event.type == "HAND_RAISE_START":
+            self.raise_started_at = event.timestamp
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.stt_engine.begin_preroll)
+            return False
+
+        if event.type == "SWIPE_LEFT":
+            deck_manager.mark_revisit()
+            await ws_manager.broadcast({
+                "type": "event",
+                "payload": {"kind": "gesture", "name": "SWIPE_LEFT"}
+            })
+
+        elif event.type == "SWIPE_UP":
+            deck_manager.mark_study_more()
+            await ws_manager.broadcast({
+                "type": "event",
+                "payload": {"kind": "gesture", "name": "SWIPE_UP"}
+            })
+
+        elif event.type == "HAND_UP":
+            self.listening.is_listening = True
+
+            # ✅ THIS IS THE CRITICAL FIX
+            await ws_manager.broadcast({
+                "type": "event",
+                "payload": {"kind": "gesture", "name": "HAND_UP"}
+            })
+
+            await ws_manager.broadcast({"type": "START_RECORDING"})
+
+            loop = asyncio.get_running_loop()
+            spoken = await loop.run_in_executor(
+                None, self.stt_engine.transcribe, deck_manager.current_word
+            )
 
-        await ws_manager.broadcast({"type": "START_RECORDING"})
 
-        loop = asyncio.get_running_loop()
-        spoken = await loop.run_in_executor(None, stt_engine.transcribe)
+            await ws_manager.broadcast({
+                "type": "STOP_RECORDING",
+                "text": spoken
+            })
 
+            correct = deck_manager.evaluate_spoken(spoken)
 
-        await ws_manager.broadcast({
-            "type": "STOP_RECORDING",
-            "text": spoken
-        })
+            # Only raises with a known start are comparable across modes
+            started, self.raise_started_at = self.raise_started_at, None
+            preroll = getattr(self.stt_engine, "last_preroll", False)
+            latency_ms = None
+            if started is not None:
+                latency_ms = round((time.time() - started) * 1000)
+                self.verdict_latencies["preroll" if preroll else "no_preroll"].append((latency_ms, correct))
+                print(f"[latency] raise→verdict {latency_ms} ms (pre-roll {'on' if preroll else 'off'})")
 
-        correct = deck_manager.evaluate_spoken(spoken)
+            self.record(session_journal.STT, {
+                "card": deck_manager.current_word,
+                "spoken": spoken,
+                "correct": correct,
+                "latency_ms": latency_ms,
+                "preroll": preroll,
+            })
+
+            if correct:
+                deck_manager.mark_learned()
+                animations.show_correct_animation()
+            else:
+                deck_manager.mark_revisit()
+                animations.show_incorrect_animation()
+
+            await ws_manager.broadcast({
+                "type": "event",
+                "payload": {
+                    "kind": "evaluation",
+                    "correct": correct,
+                    "spoken": spoken,
+                    "latency_ms": latency_ms,
+                    "preroll": preroll,
+                }
+            })
+
+            self.listening.is_listening = False
 
-        if correct:
-            deck_manager.mark_learned()
-            animations.show_correct_animation()
         else:
-            deck_manager.mark_revisit()
-            animations.show_incorrect_animation()
+            return False
 
-        await ws_manager.broadcast({
-            "type": "event",
-            "payload": {
-                "kind": "evaluation",
-                "correct": correct,
-                "spoken": spoken
-            }
-        })
+        return True
 
-        listening_state.is_listening = False
 
-    await ws_manager.broadcast_state()
+deck_manager = DeckManager(WORD_BANK)
+PREROLL_SECONDS = float(os.getenv("GESTURE_PREROLL", "1.0"))
+stt_engine = SpeechToText(
+    mode="whisper", duration=3.0, preroll=PREROLL_SECONDS, cache=stt_cache
+)
+ws_manager = ConnectionManager()
+session = LearnerSession(uuid.uuid4().hex, deck_manager, ws_manager, stt_engine)
 
 
 # -----------------------------------------------------
@@ -227,10 +387,7 @@ def start_gesture_detector():
             return
 
         def cb(event: GestureEvent):
-            asyncio.run_coroutine_threadsafe(
-                handle_gesture_event(event),
-                ASYNC_LOOP
-            )
+            session.queue.put_threadsafe(event, ASYNC_LOOP)
 
         gesture_detector = GestureDetector(cb)
         threading.Thread(
@@ -242,13 +399,52 @@ def start_gesture_detector():
         print("[gesture] Detector started")
 
 
+def open_journal():
+    """Open the journal, resuming a previous session if GESTURE_RESUME is set."""
+    global journal
+
+    resume = os.getenv("GESTURE_RESUME")
+    if resume:
+        try:
+            sessions = session_journal.list_sessions(JOURNAL_PATH)
+        except (OSError, ValueError) as e:
+            print(f"[journal] WARNING: cannot resume from {JOURNAL_PATH}: {e}")
+            sessions = []
+        session_id = sessions[-1] if resume == "last" and sessions else resume
+        if session_id in sessions:
+            deck_manager.restore(session_journal.replay_deck_state(JOURNAL_PATH, session_id))
+            session.session_id = session_id
+            print(f"[journal] Resumed session {session_id} at {deck_manager.current_word}")
+        else:
+            print(f"[journal] WARNING: no session {resume!r} in {JOURNAL_PATH}")
+
+    try:
+        journal = session_journal.JournalWriter(JOURNAL_PATH)
+    except (OSError, ValueError) as e:
+        print(f"[journal] WARNING: cannot open {JOURNAL_PATH}: {e}. Journaling disabled.")
+        journal = None
+        return
+
+    print(f"[journal] Recording session {session.session_id} to {JOURNAL_PATH}")
+
+
 @app.on_event("startup")
 async def startup():
     global ASYNC_LOOP
     ASYNC_LOOP = asyncio.get_running_loop()
+    open_journal()
+    session.start()
     start_gesture_detector()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    global journal
+    if journal is not None:
+        writer, journal = journal, None
+        await asyncio.get_running_loop().run_in_executor(None, writer.close)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     await ws_manager.connect(ws)
@@ -264,6 +460,19 @@ async def get_state():
     return deck_manager.get_state()
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "stt_cache": stt_cache.stats(),
+        "journal": journal.stats() if journal is not None else None,
+        "gesture_queue": {
+            **session.queue.stats(),
+            "state_broadcasts": session.state_broadcasts,
+        },
+        "raise_to_verdict": session.latency_stats(),
+    }
+
+
 def main():
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
 
@@ -4,7 +4,12 @@ Run via: python self_test.py
 """
 from word_bank import WORD_BANK
 from ui.flashcard_view import FlashcardView
+from stt import speech_to_text
 from stt.speech_to_text import SpeechToText
+from stt.cache import TranscriptionCache, audio_fingerprint
+from core import journal
+from core.gesture_queue import GestureQueue
+from cv.gesture_detector import GestureDetector, GestureEvent
 from cv.hand_utils import HandPosition, detect_movement_direction, is_hand_raised
 
 
@@ -27,11 +32,243 @@ def test_flashcard_view():
     assert state["current_card"]["english"] == "dog"
 
 
+def _spoken_clip(f0: float, seed: int):
+    """A voiced, vowel-like clip: a few harmonics under a smooth envelope."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    t = np.arange(12800) / 16000
+    vibrato = 1 + 0.05 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+    voice = sum(
+        rng.uniform(0.2, 1.0) * np.sin(2 * np.pi * f0 * k * t * vibrato)
+        for k in range(1, 6)
+    )
+    return np.concatenate([np.zeros(3000), np.sin(np.pi * t / t[-1]) ** 2 * voice / 5, np.zeros(3000)])
+
+
+def test_transcription_cache():
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    clip = _spoken_clip(180, seed=1)
+    noisy = [clip + 0.01 * rng.standard_normal(clip.size) for _ in range(2)]
+    other = _spoken_clip(180, seed=2)
+
+    cache = TranscriptionCache(max_entries=2, ttl=60.0)
+    calls = []
+    transcribe = lambda: calls.append(1) or "perro"
+
+    # The same clip under independent noise is a hit...
+    cache.get_or_compute(cache.key_for(noisy[0], "dog"), transcribe)
+    cache.get_or_compute(cache.key_for(noisy[1], "dog"), transcribe)
+    assert len(calls) == 1
+
+    # ...but a different clip for the same card, or another card, is not
+    cache.get_or_compute(cache.key_for(other, "dog"), transcribe)
+    cache.get_or_compute(cache.key_for(noisy[0], "cat"), transcribe)
+    assert len(calls) == 3
+    assert audio_fingerprint(other).distance(audio_fingerprint(clip)) > cache.tolerance
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["evictions"] == 1 and stats["entries"] == 2
+
+
+def test_journal_replay():
+    import os
+    import tempfile
+    import uuid
+
+    path = os.path.join(tempfile.mkdtemp(), "test.journal")
+    session_id = uuid.uuid4().hex
+    writer = journal.JournalWriter(path, flush_interval=0.0)
+    writer.append(journal.GESTURE, session_id, {"type": "SWIPE_UP"})
+    writer.append(journal.DECK, session_id, {"action": "study_more", "word": "dog", "index": 1})
+    writer.append(journal.DECK, uuid.uuid4().hex, {"action": "learned", "word": "dog", "index": 1})
+    writer.close()
+
+    # A torn tail from a crash must not break replay...
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00")
+
+    state = journal.replay_deck_state(path, session_id)
+    assert state["index"] == 1 and state["study_more"] == ["dog"] and not state["learned"]
+    assert len(journal.list_sessions(path)) == 2
+
+    # ...nor hide what is written after the restart
+    writer = journal.JournalWriter(path, flush_interval=0.0)
+    writer.append(journal.DECK, session_id, {"action": "revisit", "word": "cat", "index": 2})
+    writer.close()
+
+    state = journal.replay_deck_state(path, session_id)
+    assert state["index"] == 2 and state["revisit"] == ["cat"]
+
+    # Corruption mid-file is not a torn tail: refuse rather than truncate it away
+    with open(path, "r+b") as f:
+        f.seek(len(journal.MAGIC) + journal._HEADER.size)
+        f.write(b"#")
+    size = os.path.getsize(path)
+    try:
+        journal.JournalWriter(path)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("writer opened a journal with mid-file corruption")
+    assert os.path.getsize(path) == size
+    os.unlink(path)
+
+
+def test_gesture_queue():
+    import asyncio
+
+    busy = [False]
+    queue = GestureQueue(maxsize=3, coalesce_window=0.3, is_busy=lambda: busy[0])
+    assert queue.put_nowait(GestureEvent("SWIPE_UP", 1.0))
+    assert not queue.put_nowait(GestureEvent("SWIPE_UP", 1.1))  # jitter
+    assert queue.put_nowait(GestureEvent("SWIPE_UP", 1.5))
+    queue.put_nowait(GestureEvent("HAND_RAISE_START", 2.0))
+    queue.put_nowait(GestureEvent("HAND_RAISE_CANCEL", 2.1))
+    busy[0] = True
+    assert not queue.put_nowait(GestureEvent("SWIPE_LEFT", 3.0))
+
+    # A cancel always gets through, or an opened mic would never close
+    assert queue.put_nowait(GestureEvent("HAND_RAISE_CANCEL", 3.1))
+
+    batch = asyncio.run(queue.get_batch())
+    assert [e.timestamp for e in batch] == [1.0, 1.5, 3.1]
+    stats = queue.stats()
+    assert stats["coalesced"] == 3 and stats["dropped_busy"] == 1 and stats["forced_cancels"] == 1
+
+    # A swipe dropped on a full queue must not swallow the next real one
+    busy[0] = False
+    for t in (4.0, 4.1, 4.2):
+        queue.put_nowait(GestureEvent("HAND_UP", t))
+    assert not queue.put_nowait(GestureEvent("SWIPE_LEFT", 5.0))
+    asyncio.run(queue.get_batch())
+    assert queue.put_nowait(GestureEvent("SWIPE_LEFT", 5.1))
+    assert queue.stats()["dropped_full"] == 1
+
+    # A swipe batched behind an answer must not act on the next card
+    import main
+    from core.listening_state import ListeningState
+
+    class FakeSpeechToText:
+        def transcribe(self, card_id=None):
+            return WORD_BANK[card_id]
+
+    async def answer_then_swipe():
+        learner = main.LearnerSession(
+            "0" * 32, deck, main.ConnectionManager(), FakeSpeechToText(), ListeningState()
+        )
+        learner.queue.put_nowait(GestureEvent("HAND_UP", 6.0))
+        learner.queue.put_nowait(GestureEvent("SWIPE_LEFT", 6.1))
+        learner.start()
+        for _ in range(500):
+            if learner.state_broadcasts:
+                break
+            await asyncio.sleep(0.01)
+        learner._consumer.cancel()
+        return learner
+
+    deck = main.DeckManager(WORD_BANK)
+    first = deck.current_word
+    learner = asyncio.run(answer_then_swipe())
+    assert deck.learned_words == [first] and not deck.revisit_words and deck.index == 1
+    assert learner.queue.dropped_busy == 1
+
+
+def test_preroll():
+    import threading
+
+    import numpy as np
+
+    class FakeInputStream:
+        opened = []
+
+        def __init__(self, callback, blocksize, channels, **kwargs):
+            self.callback = callback
+            self.blocksize = blocksize
+            self.channels = channels
+            self.closed = False
+            self.fed = 0
+            FakeInputStream.opened.append(self)
+
+        def start(self):
+            pass
+
+        def feed(self, blocks):
+            for _ in range(blocks):
+                assert not self.closed, "stream closed mid-capture"
+                self.fed += 1
+                block = np.full((self.blocksize, self.channels), self.fed, dtype=np.float32)
+                self.callback(block, self.blocksize, None, None)
+
+        def stop(self):
+            self.closed = True
+
+        abort = stop
+
+        def close(self):
+            self.closed = True
+
+    stt = SpeechToText(mode="dummy", duration=0.2, preroll=0.1, block_duration=0.05, cancel_grace=0.05)
+    stt.mode = "whisper"  # speculative path without an API client
+    captured = []
+    stt._whisper = lambda audio: captured.append(audio) or "perro"
+
+    real_stream = speech_to_text.sd.InputStream
+    speech_to_text.sd.InputStream = FakeInputStream
+    try:
+        # Hovering at the threshold: one stream, reused across the bounce
+        stt.begin_preroll()
+        stt.cancel_preroll()
+        stt.begin_preroll()
+        assert len(FakeInputStream.opened) == 1
+        stream = FakeInputStream.opened[0]
+        stream.feed(3)  # ring keeps the last two blocks
+
+        # Commit, then a late cancel arrives before the window is full
+        def finish_window():
+            stt.cancel_preroll()
+            stream.feed(2)
+
+        feeder = threading.Timer(0.05, finish_window)
+        feeder.start()
+        assert stt.transcribe(card_id="dog") == "perro"
+        feeder.join()
+    finally:
+        speech_to_text.sd.InputStream = real_stream
+
+    assert len(FakeInputStream.opened) == 1 and stream.closed
+    blocks = captured[0][::stt.block_size, 0].tolist()
+    assert blocks == [2, 3, 4, 5], blocks
+
+
+def test_raise_detection():
+    events = []
+    detector = GestureDetector(callback=lambda e: events.append(e.type))
+    try:
+        detector.update_raise(True, 10.0)
+        detector.update_raise(False, 10.1)  # dropped before the dwell time
+        detector.update_raise(True, 10.2)
+        detector.update_raise(True, 10.5)
+        detector.update_raise(True, 10.6)   # cooldown: new raise, no START
+        detector.update_raise(False, 10.7)
+    finally:
+        detector.mp_hands.close()
+
+    assert events == ["HAND_RAISE_START", "HAND_RAISE_CANCEL", "HAND_RAISE_START", "HAND_UP"], events
+
+
 def run_all():
     print("Running self tests...")
     test_word_bank()
     test_hand_utils()
     test_flashcard_view()
+    test_transcription_cache()
+    test_preroll()
+    test_journal_replay()
+    test_gesture_queue()
+    test_raise_detection()
     print("All self tests passed.")
 
 
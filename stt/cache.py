@@ -0,0 +1,220 @@
+"""Process-wide cache for transcription results."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AudioFingerprint:
+    """
+    Coarse spectral profile of a clip: log band energy per time slice, in
+    whole dB relative to the loudest cell, with everything below the clip's
+    noise floor clamped to `floor`.
+    """
+    profile: bytes
+    floor: int
+
+    def distance(self, other: "AudioFingerprint") -> float:
+        """Mean dB difference over the cells that rise above either noise floor."""
+        floor = max(self.floor, other.floor)
+        a = np.maximum(np.frombuffer(self.profile, dtype=np.int8), floor)
+        b = np.maximum(np.frombuffer(other.profile, dtype=np.int8), floor)
+        signal = (a > floor) | (b > floor)
+        if not signal.any():
+            return 0.0
+        return float(np.abs(a[signal].astype(np.int16) - b[signal]).mean())
+
+
+def audio_fingerprint(
+    audio,
+    sample_rate: int = 16000,
+    slices: int = 8,
+    bands: int = 12,
+    floor_margin: float = 10.0,
+) -> Optional[AudioFingerprint]:
+    """
+    Quantized spectral fingerprint of a clip, or None for silence.
+
+    The clip is cut to the span holding the middle 96% of its energy (stable
+    under noise, unlike a peak threshold), split into `slices`, and each
+    slice reduced to log-spaced band energies. Cells within `floor_margin`
+    dB of the quietest fifth are treated as noise, so independent noise on
+    a repeat of the same clip moves the profile by well under a dB while a
+    different utterance moves it by several.
+    """
+    samples = np.asarray(audio, dtype=np.float64)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+
+    energy = np.cumsum(samples ** 2)
+    if energy.size == 0 or energy[-1] == 0.0:
+        return None
+
+    energy /= energy[-1]
+    samples = samples[np.searchsorted(energy, 0.02):np.searchsorted(energy, 0.98) + 1]
+    if samples.size < slices * 64:
+        return None
+
+    edges = np.geomspace(80.0, sample_rate / 2, bands + 1)
+    grid = np.empty((slices, bands))
+    for i, chunk in enumerate(np.array_split(samples, slices)):
+        power = np.abs(np.fft.rfft(chunk)) ** 2
+        bounds = np.searchsorted(np.fft.rfftfreq(chunk.size, 1 / sample_rate), edges)
+        grid[i] = [power[lo:hi].sum() for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    grid = 10 * np.log10(grid + 1e-12)
+    grid -= grid.max()
+    floor = max(float(np.percentile(grid, 20)) + floor_margin, -127.0)
+
+    profile = np.round(np.maximum(grid, floor)).astype(np.int8)
+    return AudioFingerprint(profile=profile.tobytes(), floor=int(round(floor)))
+
+
+@dataclass
+class _Entry:
+    fingerprint: AudioFingerprint
+    card_id: Optional[str]
+    value: Any
+    expires_at: float
+    cost: float
+
+
+class TranscriptionCache:
+    """
+    Size-bounded LRU cache with TTL, keyed by (audio fingerprint, card id).
+
+    Fingerprints match when they are within `tolerance` dB of each other for
+    the same card, so a repeat of the same audio hits even though no two
+    recordings are bit-identical. Safe to share between sessions: all
+    bookkeeping happens under one lock, and concurrent misses for the same
+    key wait on the first caller's result instead of issuing their own STT
+    request.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 600.0, tolerance: float = 1.5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tolerance = tolerance
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_card: Dict[Optional[str], List[int]] = {}
+        self._inflight: Dict[Optional[str], List[Tuple[AudioFingerprint, Future]]] = {}
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key_for(audio, card_id: Optional[str], sample_rate: int = 16000) -> Tuple[Optional[AudioFingerprint], Optional[str]]:
+        return audio_fingerprint(audio, sample_rate), card_id
+
+    def _closest(self, candidates, fingerprint: AudioFingerprint):
+        best, best_distance = None, self.tolerance
+        for candidate_fp, item in candidates:
+            distance = fingerprint.distance(candidate_fp)
+            if distance <= best_distance:
+                best, best_distance = item, distance
+        return best
+
+    def _drop(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._by_card[entry.card_id]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._by_card[entry.card_id]
+
+    def get_or_compute(self, key: Tuple[Optional[AudioFingerprint], Optional[str]], compute: Callable[[], Any]) -> Any:
+        fingerprint, card_id = key
+        if fingerprint is None:
+            return compute()  # silence or too short to fingerprint
+
+        now = time.monotonic()
+
+        with self._lock:
+            for entry_id in list(self._by_card.get(card_id, ())):
+                if self._entries[entry_id].expires_at <= now:
+                    self._drop(entry_id)
+
+            entry_id = self._closest(
+                ((self._entries[i].fingerprint, i) for i in self._by_card.get(card_id, ())),
+                fingerprint,
+            )
+            if entry_id is not None:
+                entry = self._entries[entry_id]
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                self.saved_seconds += entry.cost
+                return entry.value
+
+            inflight = self._inflight.setdefault(card_id, [])
+            future = self._closest(inflight, fingerprint)
+            leader = future is None
+            if leader:
+                future = Future()
+                inflight.append((fingerprint, future))
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            value, cost = future.result()
+            with self._lock:
+                self.saved_seconds += cost
+            return value
+
+        start = time.perf_counter()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._finish(card_id, future)
+            future.set_exception(e)
+            raise
+
+        cost = time.perf_counter() - start
+
+        with self._lock:
+            self._finish(card_id, future)
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            self._entries[entry_id] = _Entry(fingerprint, card_id, value, time.monotonic() + self.ttl, cost)
+            self._by_card.setdefault(card_id, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+        future.set_result((value, cost))
+        return value
+
+    def _finish(self, card_id: Optional[str], future: Future):
+        inflight = self._inflight[card_id]
+        inflight[:] = [(fp, f) for fp, f in inflight if f is not future]
+        if not inflight:
+            del self._inflight[card_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_card.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+                "saved_calls": self.hits + self.coalesced,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
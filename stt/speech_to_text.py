@@ -1,9 +1,18 @@
+"""Speech-to-text utilities."""
 import os
 import tempfile
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
 import sounddevice as sd
 import soundfile as sf
 from openai import OpenAI
 
+from .cache import TranscriptionCache
+
 
 class SpeechToText:
     def __init__(
@@ -12,6 +21,11 @@ class SpeechToText:
         sample_rate: int = 16000,
         channels: int = 1,
         duration: float = 3.0,
+        preroll: float = 1.0,
+        block_duration: float = 0.05,
+        warm_interval: float = 30.0,
+        cancel_grace: float = 1.0,
+        cache: Optional[TranscriptionCache] = None,
         on_start=None,
         on_stop=None,
     ):
@@ -19,9 +33,34 @@ class SpeechToText:
         self.sample_rate = sample_rate
         self.channels = channels
         self.duration = duration
+        self.preroll = preroll
+        self.block_size = int(block_duration * sample_rate)
+        self.warm_interval = warm_interval
+        self.cancel_grace = cancel_grace
+        self.cache = cache
         self.on_start = on_start
         self.on_stop = on_stop
 
+        # Speculative pre-roll: the mic is opened on "hand raise start" and
+        # keeps only the last `preroll` seconds until HAND_UP commits it.
+        # preroll=0 turns speculation off (record only after HAND_UP).
+        # A hand hovering at the threshold toggles start/cancel every frame,
+        # so cancels only disarm the stream and close it after `cancel_grace`,
+        # and warm-up runs at most once per `warm_interval`.
+        self._lock = threading.Lock()
+        self._stream = None
+        self._armed = False
+        self._close_at = None
+        self._close_timer = None
+        self._last_warm = 0.0
+        self._ring = deque(maxlen=max(1, int(np.ceil(preroll / block_duration))))
+        self._capture = None
+        self._captured_frames = 0
+        self._capture_done = threading.Event()
+
+        # Whether the last transcribe() actually used pre-roll audio
+        self.last_preroll = False
+
         if mode == "whisper":
             api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
@@ -33,7 +72,183 @@ class SpeechToText:
         else:
             self.client = None
 
-    def transcribe(self) -> str:
+    # -------------------------------------------------
+    # Speculative pre-roll
+    # -------------------------------------------------
+    @property
+    def speculative(self) -> bool:
+        return self.mode != "dummy" and self.preroll > 0
+
+    def _on_audio(self, indata, frames, time_info, status):
+        with self._lock:
+            if self._capture is None:
+                self._ring.append(indata.copy())
+                return
+
+            self._capture.append(indata.copy())
+            self._captured_frames += frames
+            if self._captured_frames >= int(self.duration * self.sample_rate):
+                self._capture_done.set()
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        self._armed = False
+        self._close_at = None
+        self._ring.clear()
+        self._capture = None
+        self._captured_frames = 0
+        self._capture_done.clear()
+        return stream
+
+    def warm_up(self):
+        """Open the HTTP connection to Whisper so the first request skips the handshake."""
+        if self.client is None:
+            return
+
+        try:
+            self.client.models.retrieve("whisper-1")
+        except Exception as e:
+            print(f"[STT] Warm-up error: {e}")
+
+    def begin_preroll(self):
+        """Start buffering mic audio before the answer is confirmed."""
+        if not self.speculative:
+            return
+
+        with self._lock:
+            self._armed = True
+            self._close_at = None
+
+            if self._stream is not None:
+                # Back up within the cancel grace period: reuse the open stream
+                self._ring.clear()
+            else:
+                try:
+                    self._stream = sd.InputStream(
+                        samplerate=self.sample_rate,
+                        channels=self.channels,
+                        dtype="float32",
+                        blocksize=self.block_size,
+                        callback=self._on_audio,
+                    )
+                    self._stream.start()
+                except Exception as e:
+                    print(f"[STT] Pre-roll mic error: {e}")
+                    self._stream = None
+                    self._armed = False
+                    return
+
+                print("[STT] Pre-roll started")
+
+            warm = self._claim_warm_up()
+
+        if warm:
+            threading.Thread(target=self.warm_up, daemon=True).start()
+
+    def _claim_warm_up(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_warm < self.warm_interval:
+            return False
+        self._last_warm = now
+        return True
+
+    def cancel_preroll(self):
+        """
+        Discard buffered audio when the raise is not confirmed. The stream
+        stays open for `cancel_grace` seconds in case the hand comes back up.
+        """
+        with self._lock:
+            if self._stream is None or not self._armed:
+                return
+
+            self._armed = False
+            self._ring.clear()
+            self._close_at = time.monotonic() + self.cancel_grace
+            if self._close_timer is None:
+                self._schedule_close(self.cancel_grace)
+
+    def _schedule_close(self, delay: float):
+        self._close_timer = threading.Timer(delay, self._close_if_idle)
+        self._close_timer.daemon = True
+        self._close_timer.start()
+
+    def _close_if_idle(self):
+        with self._lock:
+            self._close_timer = None
+            if self._stream is None or self._armed or self._close_at is None:
+                return
+
+            remaining = self._close_at - time.monotonic()
+            if remaining > 0:
+                self._schedule_close(remaining)
+                return
+
+            stream = self._close_stream()
+
+        stream.abort()
+        stream.close()
+        print("[STT] Pre-roll discarded")
+
+    def _record_with_preroll(self):
+        """
+        Commit the pre-roll buffer and record until the whole window, pre-roll
+        included, is `duration` seconds long. The answer window therefore
+        starts at the raise instead of after HAND_UP and mic setup.
+        """
+        with self._lock:
+            if self._stream is None:
+                return None
+            if not self._armed:
+                self._ring.clear()  # idle audio from before this raise
+            # Committed: a late cancel must not close the stream mid-capture
+            self._armed = False
+            self._close_at = None
+            self._capture = list(self._ring)
+            self._ring.clear()
+            self._captured_frames = sum(len(block) for block in self._capture)
+            if self._captured_frames >= int(self.duration * self.sample_rate):
+                self._capture_done.set()
+
+        self._capture_done.wait(timeout=self.duration + 1.0)
+
+        with self._lock:
+            blocks = self._capture
+            stream = self._close_stream()
+
+        if stream is not None:
+            stream.stop()
+            stream.close()
+
+        if not blocks:
+            return None
+
+        print(f"[STT] Committed {len(blocks) * self.block_size / self.sample_rate:.2f}s incl. pre-roll")
+        return np.concatenate(blocks)
+
+    def _whisper(self, audio) -> str:
+        audio_path = None
+        try:
+            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
+                sf.write(tmp.name, audio, self.sample_rate)
+                audio_path = tmp.name
+
+            with open(audio_path, "rb") as audio_file:
+                response = self.client.audio.transcriptions.create(
+                    model="whisper-1",
+                    file=audio_file,
+                )
+
+            return response.text.strip()
+
+        finally:
+            if audio_path:
+                try:
+                    os.unlink(audio_path)
+                except:
+                    pass
+
+    def transcribe(self, card_id: Optional[str] = None) -> str:
+        self.last_preroll = False
         if self.mode == "dummy":
             print("\n[STT] Dummy mode: type the Spanish word:")
             return input("> ").strip()
@@ -44,13 +259,16 @@ class SpeechToText:
         print("[STT] Recording…")
 
         try:
-            audio = sd.rec(
-                int(self.duration * self.sample_rate),
-                samplerate=self.sample_rate,
-                channels=self.channels,
-                dtype="float32",
-            )
-            sd.wait()
+            audio = self._record_with_preroll()
+            self.last_preroll = audio is not None
+            if audio is None:
+                audio = sd.rec(
+                    int(self.duration * self.sample_rate),
+                    samplerate=self.sample_rate,
+                    channels=self.channels,
+                    dtype="float32",
+                )
+                sd.wait()
         except Exception as e:
             print(f"[STT] Mic error: {e}")
             if self.on_stop:
@@ -60,26 +278,13 @@ class SpeechToText:
         if self.on_stop:
             self.on_stop()
 
-        # Save temp WAV
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-                sf.write(tmp.name, audio, self.sample_rate)
-                audio_path = tmp.name
+            if self.cache is None:
+                return self._whisper(audio)
 
-            with open(audio_path, "rb") as audio_file:
-                response = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                )
-
-            return response.text.strip()
+            key = self.cache.key_for(audio, card_id, self.sample_rate)
+            return self.cache.get_or_compute(key, lambda: self._whisper(audio))
 
         except Exception as e:
             print(f"[STT] Whisper error: {e}")
             return ""
-
-        finally:
-            try:
-                os.unlink(audio_path)
-            except:
-                pass